@@ -1,5 +1,8 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from data_storage import db_manager
 
@@ -33,14 +36,65 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Column types for the snapshot table: symbols repeat, so dictionary-encode them.
+# Prices stay float64; float32 loses cents above ~131k.
+SNAPSHOT_SCHEMA = pa.schema([
+    ('symbol', pa.dictionary(pa.int32(), pa.string())),
+    ('price', pa.float64()),
+    ('atr', pa.float64()),
+    ('exit_price', pa.float64()),
+    ('timestamp', pa.timestamp('ms')),
+])
+
+# Seconds between checks for new webhook data
+POLL_INTERVAL = 2
+
 def format_currency(value):
     """Format number as currency"""
     return f"${value:,.2f}"
 
-def load_data():
-    """Load latest data from database"""
-    data = db_manager.get_latest_data_per_symbol()
-    return data
+@st.cache_data(ttl=5, show_spinner=False)
+def build_snapshot(version: int):
+    """Build the snapshot table for the given data version as Arrow IPC bytes
+
+    The version argument is only used as the cache key; it changes
+    whenever the webhook receiver inserts new data.
+    """
+    table = db_manager.get_latest_arrow(schema=SNAPSHOT_SCHEMA)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def load_snapshot(version: int):
+    """Load the cached snapshot table without rebuilding it"""
+    return pa.ipc.open_stream(build_snapshot(version)).read_all()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def build_exports(version: int):
+    """Serialize the download files (Feather and CSV) for the given data version"""
+    table = load_snapshot(version).rename_columns(
+        ['Symbol', 'Price', 'ATR', 'Exit Price', 'Last Updated']
+    )
+
+    feather_buf = pa.BufferOutputStream()
+    feather.write_feather(table, feather_buf)
+
+    csv_buf = pa.BufferOutputStream()
+    pa_csv.write_csv(table, csv_buf)
+
+    return feather_buf.getvalue().to_pybytes(), csv_buf.getvalue().to_pybytes()
+
+@st.fragment(run_every=POLL_INTERVAL)
+def poll_for_updates(rendered_version: int):
+    """Rerun the whole page only once the webhook receiver has written new data
+
+    Only this fragment reruns on the timer, so polling costs a single
+    version lookup until something actually changes.
+    """
+    if db_manager.get_version() != rendered_version:
+        st.rerun()
 
 def main():
     # Header
@@ -55,15 +109,17 @@ def main():
             st.rerun()
 
     # Load data
-    data = load_data()
+    version = db_manager.get_version()
+    table = load_snapshot(version)
+    poll_for_updates(version)
 
     # Display last updated time
     with col3:
-        if data:
+        if table.num_rows:
             st.markdown(f"**Last Update:** {datetime.now().strftime('%H:%M:%S')}")
 
     # Main content
-    if not data:
+    if not table.num_rows:
         st.info("📊 No data available yet. Waiting for TradingView webhooks...")
         st.markdown("""
         ### How to send data:
@@ -79,55 +135,50 @@ def main():
         3. Data will appear here after the first webhook is received
         """)
     else:
-        # Convert to DataFrame and calculate exit price
-        df = pd.DataFrame(data)
-
-        # Calculate exit price
-        df['exit_price'] = df['price'] - df['atr']
-
-        # Reorder columns
-        df = df[['symbol', 'price', 'atr', 'exit_price', 'timestamp']]
-
-        # Rename columns for display
-        df.columns = ['Symbol', 'Price', 'ATR', 'Exit Price', 'Last Updated']
-
-        # Format timestamp
-        df['Last Updated'] = pd.to_datetime(df['Last Updated']).dt.strftime('%Y-%m-%d %H:%M:%S')
-
         # Display metrics
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Symbols", len(df))
+            st.metric("Total Symbols", table.num_rows)
         with col2:
-            avg_price = df['Price'].mean()
-            st.metric("Avg Price", format_currency(avg_price))
+            st.metric("Avg Price", format_currency(pc.mean(table['price']).as_py()))
         with col3:
-            avg_atr = df['ATR'].mean()
-            st.metric("Avg ATR", format_currency(avg_atr))
+            st.metric("Avg ATR", format_currency(pc.mean(table['atr']).as_py()))
 
         # Display table
         st.markdown("### Investment Data")
 
-        # Format numeric columns
-        styled_df = df.copy()
-        styled_df['Price'] = styled_df['Price'].apply(format_currency)
-        styled_df['ATR'] = styled_df['ATR'].apply(format_currency)
-        styled_df['Exit Price'] = styled_df['Exit Price'].apply(format_currency)
-
-        # Display as interactive dataframe
+        # Display as interactive dataframe, currency formatting is done by the frontend
         st.dataframe(
-            styled_df,
+            table,
             use_container_width=True,
-            hide_index=True
+            hide_index=True,
+            column_config={
+                'symbol': st.column_config.TextColumn("Symbol"),
+                'price': st.column_config.NumberColumn("Price", format="$%.2f"),
+                'atr': st.column_config.NumberColumn("ATR", format="$%.2f"),
+                'exit_price': st.column_config.NumberColumn("Exit Price", format="$%.2f"),
+                'timestamp': st.column_config.DatetimeColumn("Last Updated", format="YYYY-MM-DD HH:mm:ss"),
+            }
         )
 
-        # Download button
-        st.download_button(
-            label="📥 Download CSV",
-            data=df.to_csv(index=False).encode('utf-8'),
-            file_name=f'investment_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-            mime='text/csv',
-        )
+        # Download buttons
+        feather_data, csv_data = build_exports(version)
+        file_stem = f'investment_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        col1, col2, _ = st.columns([1, 1, 2])
+        with col1:
+            st.download_button(
+                label="📥 Download Feather",
+                data=feather_data,
+                file_name=f'{file_stem}.feather',
+                mime='application/vnd.apache.arrow.file',
+            )
+        with col2:
+            st.download_button(
+                label="📥 Download CSV",
+                data=csv_data,
+                file_name=f'{file_stem}.csv',
+                mime='text/csv',
+            )
 
         # Additional information
         with st.expander("ℹ️ About Exit Price Calculation"):
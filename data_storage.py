@@ -1,107 +1,326 @@
+import atexit
+import logging
+import queue
 import sqlite3
 import threading
+import time
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from contextlib import contextmanager
 
+logger = logging.getLogger(__name__)
+
 # Use /data directory if it exists (Railway volume), otherwise use current directory
 DB_DIR = "/data" if os.path.exists("/data") else "."
 DB_PATH = os.path.join(DB_DIR, "investment_data.db")
 
+# Connections are shared across threads; ~2x cores suits an fsync-bound SQLite workload
+POOL_SIZE = min(8, 2 * (os.cpu_count() or 1))
+
+# Seconds between background flushes of buffered inserts
+FLUSH_INTERVAL = 0.2
+
+# Buffered inserts allowed before insert_data starts refusing new data
+MAX_BUFFERED_ROWS = 10000
+
+# sqlite3 caches prepared statements per connection, keyed on the SQL text.
+# The pool is long-lived, so keep every runtime statement as a constant and
+# leave room in the cache for all of them.
+CACHED_STATEMENTS = 256
+
+INSERT_SQL = """
+    INSERT INTO investment_data (symbol, price, atr, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+UPSERT_LATEST_SQL = """
+    INSERT OR REPLACE INTO latest_per_symbol (symbol, price, atr, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+BUMP_VERSION_SQL = """
+    INSERT INTO meta (key, value) VALUES ('version', 1)
+    ON CONFLICT(key) DO UPDATE SET value = value + 1
+"""
+
+VERSION_SQL = "SELECT value FROM meta WHERE key = 'version'"
+
+LATEST_SQL = """
+    SELECT symbol, price, atr, timestamp
+    FROM latest_per_symbol
+    ORDER BY timestamp DESC
+"""
+
+COUNT_SYMBOLS_SQL = "SELECT COUNT(*) FROM latest_per_symbol"
+
+LATEST_DISPLAY_SQL = """
+    SELECT
+        symbol,
+        price,
+        atr,
+        price - atr AS exit_price,
+        CAST(timestamp * 1000 AS INTEGER) AS timestamp
+    FROM latest_per_symbol
+    ORDER BY timestamp DESC
+"""
+
+# LIMIT -1 means no limit in SQLite, so the statement text never changes
+ALL_DATA_SQL = "SELECT symbol, price, atr, timestamp FROM investment_data ORDER BY timestamp DESC LIMIT ?"
+
+# Latest row per symbol: one idx_symbol_timestamp seek per distinct symbol.
+# Only used by _init_db to backfill latest_per_symbol when it is empty.
+LATEST_PER_SYMBOL_SQL = """
+    SELECT i.symbol, i.price, i.atr, i.timestamp
+    FROM (SELECT DISTINCT symbol FROM investment_data) s
+    JOIN investment_data i ON i.id = (
+        SELECT id FROM investment_data
+        WHERE symbol = s.symbol
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    )
+"""
+
 class DatabaseManager:
     """Thread-safe database manager for investment data"""
 
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, pool_size: int = POOL_SIZE):
         self.db_path = db_path
-        self._local = threading.local()
+        self._pool: queue.Queue = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._buffer: List[Tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_failed = False
         self._init_db()
+        atexit.register(self.flush)
 
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self._local.connection.row_factory = sqlite3.Row
+        """Context manager that borrows a connection from the pool"""
+        conn = self._pool.get()
         try:
-            yield self._local.connection
+            yield conn
         except Exception as e:
-            self._local.connection.rollback()
+            conn.rollback()
             raise e
+        finally:
+            self._pool.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a pooled connection with performance pragmas applied"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL lets dashboard reads run concurrently with webhook writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-64000")
+        return conn
+
+    def _migrate_timestamps(self):
+        """Convert TEXT timestamps from older databases to unix epoch REAL"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # IMMEDIATE so concurrent workers wait here instead of migrating twice
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("PRAGMA table_info(investment_data)")
+            columns = {row['name']: row['type'] for row in cursor.fetchall()}
+            if columns and columns.get('timestamp') != 'REAL':
+                cursor.execute("ALTER TABLE investment_data RENAME TO investment_data_old")
+                cursor.execute("""
+                    CREATE TABLE investment_data (
+                        id INTEGER PRIMARY KEY,
+                        symbol TEXT NOT NULL,
+                        price REAL NOT NULL,
+                        atr REAL NOT NULL,
+                        timestamp REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+                    )
+                """)
+                cursor.execute("""
+                    INSERT INTO investment_data (id, symbol, price, atr, timestamp)
+                    SELECT id, symbol, price, atr, COALESCE(CAST(strftime('%s', timestamp) AS REAL), 0)
+                    FROM investment_data_old
+                """)
+                # Also drops the old idx_symbol_timestamp, recreated by _init_db
+                cursor.execute("DROP TABLE investment_data_old")
+                # Derived data, backfilled again by _init_db
+                cursor.execute("DROP TABLE IF EXISTS latest_per_symbol")
+            conn.commit()
 
     def _init_db(self):
         """Initialize database with required tables"""
+        self._migrate_timestamps()
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # Timestamps are unix epoch seconds: 8-byte REALs compare faster than TEXT
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS investment_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER PRIMARY KEY,
                     symbol TEXT NOT NULL,
                     price REAL NOT NULL,
                     atr REAL NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    timestamp REAL NOT NULL DEFAULT (strftime('%s', 'now'))
                 )
             """)
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_symbol_timestamp
                 ON investment_data(symbol, timestamp DESC)
             """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            # Latest row per symbol, kept up to date by insert_data
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS latest_per_symbol (
+                    symbol TEXT PRIMARY KEY,
+                    price REAL NOT NULL,
+                    atr REAL NOT NULL,
+                    timestamp REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            # Backfill only when the table is new or was dropped by a migration,
+            # so normal startups skip the scan over investment_data
+            cursor.execute("SELECT 1 FROM latest_per_symbol LIMIT 1")
+            if cursor.fetchone() is None:
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO latest_per_symbol (symbol, price, atr, timestamp)
+                    {LATEST_PER_SYMBOL_SQL}
+                """)
             conn.commit()
 
     def insert_data(self, symbol: str, price: float, atr: float) -> bool:
-        """Insert new investment data"""
+        """Queue new investment data, written by the background flusher
+
+        Returns False without queuing if the last flush failed or the buffer
+        is full, so callers can report the error instead of losing the data.
+        """
+        # Timestamp on receipt (unix epoch seconds) since the write is deferred
+        timestamp = time.time()
+        with self._buffer_lock:
+            if self._flush_failed or len(self._buffer) >= MAX_BUFFERED_ROWS:
+                return False
+            self._buffer.append((symbol, price, atr, timestamp))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        return True
+
+    def _flush_loop(self):
+        """Periodically write buffered inserts"""
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write all buffered inserts in a single transaction"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch = self._buffer[:]
+                self._buffer.clear()
+            if not batch:
+                return True
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.executemany(INSERT_SQL, batch)
+                    # Rows are in arrival order, so the newest per symbol wins
+                    cursor.executemany(UPSERT_LATEST_SQL, batch)
+                    # Bump the data version so readers can detect new inserts cheaply
+                    cursor.execute(BUMP_VERSION_SQL)
+                    conn.commit()
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._buffer_lock:
+                    self._buffer[:0] = batch
+                    already_failing = self._flush_failed
+                    self._flush_failed = True
+                # The flusher retries every FLUSH_INTERVAL, so only log the first failure
+                if not already_failing:
+                    logger.exception("Error inserting data, retrying until the database recovers")
+                return False
+            with self._buffer_lock:
+                recovered = self._flush_failed
+                self._flush_failed = False
+            if recovered:
+                logger.warning("Database writes recovered, buffered inserts flushed")
+            return True
+
+    def get_version(self) -> int:
+        """Get the data version, incremented on every flushed batch of inserts"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO investment_data (symbol, price, atr)
-                    VALUES (?, ?, ?)
-                """, (symbol, price, atr))
-                conn.commit()
-                return True
-        except Exception as e:
-            print(f"Error inserting data: {e}")
-            return False
+                cursor.execute(VERSION_SQL)
+                row = cursor.fetchone()
+                return row[0] if row else 0
+        except Exception:
+            logger.exception("Error fetching version")
+            return 0
 
     def get_latest_data_per_symbol(self) -> List[Dict]:
         """Get the most recent data for each symbol"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    WITH ranked_data AS (
-                        SELECT
-                            symbol,
-                            price,
-                            atr,
-                            timestamp,
-                            ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) as rn
-                        FROM investment_data
-                    )
-                    SELECT symbol, price, atr, timestamp
-                    FROM ranked_data
-                    WHERE rn = 1
-                    ORDER BY timestamp DESC
-                """)
+                cursor.execute(LATEST_SQL)
                 rows = cursor.fetchall()
                 return [dict(row) for row in rows]
-        except Exception as e:
-            print(f"Error fetching data: {e}")
+        except Exception:
+            logger.exception("Error fetching data")
             return []
 
+    def count_symbols(self) -> int:
+        """Get the number of distinct symbols"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(COUNT_SYMBOLS_SQL)
+            return cursor.fetchone()[0]
+
+    def get_latest_arrow(self, schema=None):
+        """Get display-ready latest rows per symbol as a pyarrow Table
+
+        Columns are symbol, price, atr, exit_price and timestamp (unix epoch
+        milliseconds). Rows are transposed straight into column lists, so no
+        per-row dicts are built.
+        """
+        # Imported here so the webhook receiver doesn't load pyarrow
+        import pyarrow as pa
+
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(LATEST_DISPLAY_SQL)
+                names = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+            values = list(zip(*rows)) if rows else [()] * len(names)
+            return pa.Table.from_pydict(
+                {name: list(column) for name, column in zip(names, values)},
+                schema=schema
+            )
+        except Exception:
+            logger.exception("Error fetching data")
+            return schema.empty_table() if schema is not None else pa.table({})
+
     def get_all_data(self, limit: Optional[int] = None) -> List[Dict]:
         """Get all data with optional limit"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                query = "SELECT symbol, price, atr, timestamp FROM investment_data ORDER BY timestamp DESC"
-                if limit:
-                    query += f" LIMIT {limit}"
-                cursor.execute(query)
+                cursor.execute(ALL_DATA_SQL, (limit if limit else -1,))
                 rows = cursor.fetchall()
                 return [dict(row) for row in rows]
-        except Exception as e:
-            print(f"Error fetching all data: {e}")
+        except Exception:
+            logger.exception("Error fetching all data")
             return []
 
 # Singleton instance
@@ -1,29 +1,64 @@
+import logging
+import logging.handlers
+import queue
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 import uvicorn
 from data_storage import db_manager
 
+def start_logging():
+    """Route root log records through a queue to a listener thread
+
+    Request handlers only enqueue records, so logging never blocks the
+    request path on I/O. Returns the handler and listener for stop_logging.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    logging.getLogger().addHandler(queue_handler)
+    listener.start()
+    return queue_handler, listener
+
+def stop_logging(queue_handler, listener):
+    """Drain the log queue and detach the handler added by start_logging"""
+    listener.stop()
+    logging.getLogger().removeHandler(queue_handler)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    queue_handler, listener = start_logging()
+    yield
+    # Write any buffered inserts while logging is still running
+    db_manager.flush()
+    stop_logging(queue_handler, listener)
+
 app = FastAPI(
     title="TradingView Webhook Receiver",
     description="Receives investment data from TradingView webhooks",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class WebhookData(BaseModel):
     """Expected webhook payload from TradingView"""
-    symbol: str = Field(..., description="Stock/crypto ticker symbol")
-    price: float = Field(..., description="Current closing price")
-    atr: float = Field(..., description="Average True Range value")
-
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
             "example": {
                 "symbol": "AAPL",
                 "price": 150.25,
                 "atr": 2.35
             }
         }
+    )
+
+    symbol: str = Field(..., description="Stock/crypto ticker symbol")
+    price: float = Field(..., gt=0, description="Current closing price, must be positive")
+    atr: float = Field(..., ge=0, description="Average True Range value, cannot be negative")
 
 @app.get("/")
 async def root():
@@ -50,12 +85,6 @@ async def receive_webhook(data: WebhookData):
     }
     """
     try:
-        # Validate data
-        if data.price <= 0:
-            raise HTTPException(status_code=400, detail="Price must be positive")
-        if data.atr < 0:
-            raise HTTPException(status_code=400, detail="ATR cannot be negative")
-
         # Store in database
         success = db_manager.insert_data(
             symbol=data.symbol,
@@ -64,11 +93,11 @@ async def receive_webhook(data: WebhookData):
         )
 
         if not success:
-            raise HTTPException(status_code=500, detail="Failed to store data")
+            raise HTTPException(status_code=500, detail="Failed to queue data for storage")
 
         return {
             "status": "success",
-            "message": f"Data for {data.symbol} received and stored",
+            "message": f"Data for {data.symbol} received and queued for storage",
             "data": {
                 "symbol": data.symbol,
                 "price": data.price,
@@ -87,11 +116,11 @@ async def health_check():
     """Detailed health check with database status"""
     try:
         # Test database connection
-        data = db_manager.get_latest_data_per_symbol()
+        records_count = db_manager.count_symbols()
         return {
             "status": "healthy",
             "database": "connected",
-            "records_count": len(data)
+            "records_count": records_count
         }
     except Exception as e:
         return {
@@ -105,5 +134,8 @@ if __name__ == "__main__":
         "webhook_receiver:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        loop="uvloop",
+        http="httptools",
+        workers=2,
+        reload=False
     )
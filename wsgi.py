@@ -1,3 +1,4 @@
+import atexit
 import sys
 
 # Add your project directory to the sys.path
@@ -5,8 +6,21 @@ project_home = '/home/yourusername/riskdashboard'
 if project_home not in sys.path:
     sys.path.insert(0, project_home)
 
-# Import the Flask app
-from main import app
+from a2wsgi import ASGIMiddleware
 
-# Flask apps are already WSGI-compatible
-application = app
+# Import the FastAPI app
+from data_storage import db_manager
+from webhook_receiver import app, start_logging, stop_logging
+
+# ASGIMiddleware doesn't run the app's lifespan, so start logging here
+queue_handler, log_listener = start_logging()
+
+def shutdown():
+    """Write buffered inserts while logging is still running, then stop logging"""
+    db_manager.flush()
+    stop_logging(queue_handler, log_listener)
+
+atexit.register(shutdown)
+
+# FastAPI is an ASGI app; wrap it for WSGI-only hosts
+application = ASGIMiddleware(app)